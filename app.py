@@ -1,77 +1,357 @@
 import streamlit as st
 import matplotlib
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
 import datetime
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 
 # ------------------------------
 # Config
 # ------------------------------
 st.set_page_config(page_title="MarkSense", layout="wide")
 PLOTLY_THEME = "plotly_white"
+pio.json.config.default_engine = "orjson"  # C encoder for st.plotly_chart's figure JSON
 GSHEET_NAME = "MarkSenseHistory"           # your sheet name
 SERVICE_ACCOUNT_FILE = "service_account.json"  # place this next to the app
 subjects = ["Maths", "Science", "English", "History", "Computer"]
+HISTORY_COLS = ["Date", "Name", *subjects, "Total", "Average", "Rank"]  # sheet column order
+NUMERIC_COLS = [*subjects, "Total", "Average", "Rank"]
+INPUT_COLS = ["Name", *subjects]  # one student's entered record
+MARK_LABELS = {sub: f"{sub} marks" for sub in subjects}  # student editor column headers
+PAGES = ("Home", "Visualizer", "Progress", "About")
 
 # ----------------------------------
 # Connect to Google Sheets securely
 # ----------------------------------
+@st.cache_resource(ttl=3600, show_spinner=False)
+def _open_sheet():
+    """Authorize once an hour per process and return the worksheet handle (raises on failure)."""
+    scope = [
+        "https://spreadsheets.google.com/feeds",
+        "https://www.googleapis.com/auth/drive"
+    ]
+    # Load credentials securely from Streamlit Secrets
+    service_account_info = dict(st.secrets["google_service_account"])
+    client = gspread.service_account_from_dict(service_account_info, scopes=scope)
+    return client.open(GSHEET_NAME).sheet1
+
 def connect_sheets():
     """Return gspread sheet object or None if connection fails."""
     try:
-        scope = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/drive"
-        ]
-        # Load credentials securely from Streamlit Secrets
-        service_account_info = st.secrets["google_service_account"]
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(service_account_info, scope)
-        client = gspread.authorize(creds)
-        sheet = client.open(GSHEET_NAME).sheet1
-        return sheet
+        return _open_sheet()
     except Exception as e:
         st.warning("Google Sheets connection failed. Reason: " + str(e))
         return None
 
+@st.cache_data(ttl=60, show_spinner=False)
+def _load_history(_sheet, sheet_id):
+    """Fetch the sheet into a typed DataFrame; cached per spreadsheet id (raises on failure)."""
+    # raw numbers come back typed; dates as text so the ISO Date strings stay comparable
+    values = _sheet.get(value_render_option="UNFORMATTED_VALUE",
+                        date_time_render_option="FORMATTED_STRING")
+    if len(values) < 2:
+        return pd.DataFrame(columns=HISTORY_COLS)
+    header = values[0]
+    # rows are ragged: trailing blank cells are omitted, and stray cells past the header are dropped
+    df = pd.DataFrame(values[1:]).iloc[:, :len(header)]
+    df.columns = header[:df.shape[1]]
+    # one reindex adds any missing columns and fixes the order (duplicate headers, e.g. blanks, would break it)
+    df = df.loc[:, ~df.columns.duplicated()].reindex(columns=HISTORY_COLS)
+    # blank/stray marks -> 0; blank Total/Average (legacy rows) are recomputed from the marks
+    df[subjects] = numeric_block(df, subjects)
+    totals = df[subjects].to_numpy().sum(axis=1)
+    stored = numeric_block(df, ["Total", "Average"], fill=np.nan)
+    df["Total"] = np.where(np.isnan(stored[:, 0]), totals, stored[:, 0])
+    df["Average"] = np.where(np.isnan(stored[:, 1]), totals / len(subjects), stored[:, 1])
+    df["Rank"] = numeric_block(df, ["Rank"], np.int64)[:, 0]
+    # low-cardinality keys: filters/groupbys compare integer codes, not Python strings;
+    # Date is ordered (ISO strings sort chronologically) so .max()/sorting keep working
+    df["Name"] = df["Name"].astype("category")
+    df["Date"] = pd.Categorical(df["Date"], ordered=True)
+    return df
+
 def read_history_from_sheet(sheet):
     """Return a DataFrame read from the sheet, or an empty DataFrame."""
     try:
-        data = sheet.get_all_records()
-        if not data:
-            cols = ["Date", "Name"] + subjects + ["Total", "Average", "Rank"]
-            return pd.DataFrame(columns=cols)
-        df = pd.DataFrame(data)
-        for c in ["Date", "Name"] + subjects + ["Total", "Average", "Rank"]:
-            if c not in df.columns:
-                df[c] = None
-        return df[["Date", "Name"] + subjects + ["Total", "Average", "Rank"]]
+        return _load_history(sheet, sheet.spreadsheet.id)
     except Exception as e:
         st.warning("Failed reading sheet: " + str(e))
-        return pd.DataFrame(columns=["Date", "Name"] + subjects + ["Total", "Average", "Rank"])
+        return pd.DataFrame(columns=HISTORY_COLS)
 
 def append_rows_to_sheet(sheet, df_rows):
-    """Append rows (iterable of lists) to the sheet."""
+    """Append rows (iterable of lists) to the sheet in a single batched request."""
     try:
-        for row in df_rows:
-            sheet.append_row(row)
+        sheet.append_rows([list(row) for row in df_rows], value_input_option="RAW")
         return True
     except Exception as e:
         st.warning("Failed writing to Google Sheet: " + str(e))
         return False
 
-# Connect once
+def clear_student_inputs():
+    """Start a fresh student editor (new widget key) so it redraws from session_state.student_table without old edits."""
+    st.session_state.editor_rev = st.session_state.get("editor_rev", 0) + 1
+
+def fit_students(rows, n, max_marks):
+    """Return rows (an INPUT_COLS frame) cut or padded to n students; new rows get default names and half marks."""
+    rows = rows.iloc[:n]
+    if len(rows) < n:
+        pad = pd.DataFrame({
+            "Name": [f"Student {i+1}" for i in range(len(rows), n)],
+            **{sub: np.full(n - len(rows), max_marks // 2, dtype=np.int64) for sub in subjects},
+        })
+        rows = pd.concat([rows, pad], ignore_index=True) if len(rows) else pad
+    return rows.reset_index(drop=True)
+
+def numeric_block(df, cols, dtype=np.float64, fill=0):
+    """Return df[cols] as one typed array, with missing/unparseable cells as fill."""
+    return np.column_stack([
+        pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=dtype, na_value=fill) for c in cols
+    ])
+
+def min_rank(totals):
+    """Descending "min" ranks (ties share the best rank): 1 + number of strictly higher totals."""
+    return np.searchsorted(np.sort(-totals), -totals, side="left") + 1
+
+def add_totals(df):
+    """Return df with Total, Average and min Rank computed from the subject marks in one NumPy pass."""
+    totals = df[subjects].to_numpy().sum(axis=1)
+    return df.assign(Total=totals, Average=totals / len(subjects), Rank=min_rank(totals))
+
+def top_k_positions(values, k):
+    """Positions of the k largest values, largest first, ties kept in row order (like nlargest)."""
+    k = min(k, len(values))
+    kth = np.partition(values, len(values) - k)[len(values) - k]  # k-th largest value
+    candidates = np.flatnonzero(values >= kth)
+    return candidates[np.argsort(-values[candidates], kind="stable")[:k]]
+
+def daily_progress(df):
+    """Return (per-date mean Average, per-date max Total) frames from the Date codes via bincount/reduceat."""
+    codes = df["Date"].cat.codes.to_numpy()  # ordered categories, so code order is date order
+    keep = codes >= 0  # rows without a Date
+    codes = codes[keep]
+    avg = df["Average"].to_numpy(dtype=np.float64)[keep]  # never NaN: the loader fills it from the marks
+    n_dates = len(df["Date"].cat.categories)
+    rows = np.bincount(codes, minlength=n_dates)
+    present = rows > 0
+    means = np.bincount(codes, weights=avg, minlength=n_dates)[present] / rows[present]
+    totals = df["Total"].to_numpy(dtype=np.float64)[keep][np.argsort(codes, kind="stable")]
+    tops = np.fmax.reduceat(totals, np.cumsum(rows[present]) - rows[present]) if len(totals) else totals
+    dates = df["Date"].cat.categories.to_numpy()[present]
+    return pd.DataFrame({"Date": dates, "Average": means}), pd.DataFrame({"Date": dates, "Total": tops})
+
+BLUES = matplotlib.colormaps["Blues"]
+GRADIENT_MAX_ROWS = 50
+HEX_BYTES = np.array([f"{i:02x}" for i in range(256)])
+
+@st.cache_data(show_spinner=False)
+def gradient_css(values):
+    """Per-column Blues gradient CSS, matching Styler.background_gradient's defaults, in one NumPy pass."""
+    lo, hi = values.min(axis=0), values.max(axis=0)
+    rgba = BLUES(np.divide(values - lo, hi - lo, out=np.zeros_like(values), where=hi > lo))
+    rgb = rgba[..., :3]
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    dark = linear @ np.array([0.2126, 0.7152, 0.0722]) < 0.408  # W3C relative luminance
+    r, g, b = HEX_BYTES[np.rint(rgb * 255).astype(np.int64)].transpose(2, 0, 1)
+    css = np.char.add("background-color: #", np.char.add(np.char.add(r, g), b))
+    return np.char.add(css, np.where(dark, ";color: #f1f1f1;", ";color: #000000;"))
+
+def blues_gradient(df, cols):
+    """Return a Styler shading cols with the cached Blues gradient, or df itself when too long to style."""
+    if len(df) > GRADIENT_MAX_ROWS:
+        return df  # Styler emits per-cell CSS; the native grid is much faster for long tables
+    css = gradient_css(df[cols].to_numpy(dtype=np.float64))
+    return df.style.apply(lambda _: css, axis=None, subset=cols)
+
+# ------------------------------
+# Chart builders (cached per input, so reruns reuse the figure)
+# ------------------------------
+@st.cache_data(show_spinner=False)
+def build_subject_fig(selected_date, means, chart_style, class_avg):
+    """Subject-average Bar/Line chart; pass class_avg=None to hide the average line."""
+    if chart_style == "Bar":
+        trace = go.Bar(x=subjects, y=np.asarray(means), marker_color='#1f77b4')
+    else:
+        trace = go.Scatter(x=subjects, y=np.asarray(means), mode="lines+markers")
+    fig = go.Figure(trace)
+    fig.update_layout(template=PLOTLY_THEME,
+                      title=f"Subject Averages - {selected_date}",
+                      xaxis_title='Subject', yaxis_title='Average Marks')
+    if class_avg is not None:
+        fig.add_hline(y=class_avg, line_dash="dash",
+                      annotation_text=f"Class Avg: {class_avg:.1f}",
+                      line_color="red")
+    return fig
+
+@st.cache_data(show_spinner=False)
+def build_compare_fig(names, marks, totals, comparison_type):
+    """Total-marks or grouped subject-wise comparison chart for the selected students."""
+    if comparison_type == "Total Marks":
+        totals = np.asarray(totals)
+        fig = go.Figure(go.Bar(x=list(names), y=totals,
+                               marker=dict(color=totals, colorscale='Blues',
+                                           showscale=True, colorbar=dict(title='Total'))))
+        fig.update_layout(title="Total Marks Comparison",
+                          template=PLOTLY_THEME,
+                          xaxis_title='Name', yaxis_title='Total')
+        return fig
+    fig = go.Figure()
+    for name, row in zip(names, np.asarray(marks)):  # one trace per student, no long-form reshape
+        fig.add_bar(name=name, x=subjects, y=row)
+    fig.update_layout(barmode='group',
+                      title="Subject-wise Comparison",
+                      template=PLOTLY_THEME,
+                      xaxis_title='Subject', yaxis_title='Marks', legend_title_text='Name')
+    return fig
+
+@st.cache_data(show_spinner=False)
+def build_histogram_fig(values, label, title, color):
+    """10-bin distribution histogram of one per-student column."""
+    fig = go.Figure(go.Histogram(x=np.asarray(values), nbinsx=10, marker_color=color))
+    fig.update_layout(title=title,
+                      template=PLOTLY_THEME,
+                      xaxis_title=label, yaxis_title='Number of Students')
+    return fig
+
+@st.cache_data(show_spinner=False)
+def build_student_fig(name, marks):
+    """Per-subject bar chart for one student."""
+    fig = go.Figure(go.Bar(x=subjects, y=np.asarray(marks)))
+    fig.update_layout(title=f"{name}'s Subject Performance",
+                      template=PLOTLY_THEME,
+                      xaxis_title='Subject', yaxis_title='Marks')
+    return fig
+
+MARKS_LAYOUT = dict(template=PLOTLY_THEME, xaxis_title="Name", yaxis_title="Marks",
+                    legend_title_text="Subject")  # shared by the Visualizer Bar/Line charts
+
+@st.cache_data(show_spinner=False)
+def build_marks_fig(chart_type, names, marks):
+    """Visualizer Bar/Line/Radar chart of the entered marks, built straight from the marks array."""
+    if chart_type == "Radar":
+        closed = np.append(marks, marks[:, :1], axis=1)  # repeat the first subject to close each loop
+        theta = [*subjects, subjects[0]]
+        fig = go.Figure([go.Scatterpolar(r=row, theta=theta, mode="lines", name=name)
+                         for name, row in zip(names, closed)])
+        fig.update_layout(template=PLOTLY_THEME, title="Radar Chart", legend_title_text="Name")
+        return fig
+    if chart_type == "Bar":
+        traces = [go.Bar(x=names, y=col, name=sub) for sub, col in zip(subjects, marks.T)]
+        fig = go.Figure(traces, layout=MARKS_LAYOUT)
+        fig.update_layout(barmode="group", title="Marks Comparison")
+    else:
+        traces = [go.Scattergl(x=names, y=col, mode="lines+markers", name=sub) for sub, col in zip(subjects, marks.T)]
+        fig = go.Figure(traces, layout=MARKS_LAYOUT)
+        fig.update_layout(title="Trend Across Subjects")
+    return fig
+
+# ------------------------------
+# Home interactive sections (fragments: a widget change reruns only its own section)
+# ------------------------------
+@st.fragment
+def subject_chart_section(latest_data, selected_date, avg_today):
+    """Subject-average chart with its Bar/Line and class-average options."""
+    chart_col1, chart_col2 = st.columns([3, 1])
+
+    with chart_col2:
+        st.write("**Options:**")
+        show_class_avg = st.checkbox("Show Class Average", value=True)
+        chart_style = st.radio("Chart Style:", ["Bar", "Line"], index=0)
+
+    with chart_col1:
+        subject_means = latest_data[subjects].mean()
+        fig = build_subject_fig(selected_date, tuple(subject_means.tolist()), chart_style,
+                                float(avg_today) if show_class_avg else None)
+        st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+def compare_section(latest_data, student_names):
+    """Multiselect comparison of up to 5 students, with chart and shaded table."""
+    search_col1, search_col2 = st.columns([2, 1])
+
+    with search_col1:
+        selected_students = st.multiselect(
+            "Select students to compare (max 5):",
+            student_names,
+            default=student_names[:2] if len(student_names) >= 2 else student_names,
+            max_selections=5
+        )
+
+    with search_col2:
+        comparison_type = st.radio("Compare by:", ["Total Marks", "Subject-wise"])
+
+    if selected_students:
+        filtered_students = latest_data.loc[selected_students].reset_index(drop=True)
+
+        fig_compare = build_compare_fig(tuple(filtered_students['Name'].tolist()),
+                                        tuple(map(tuple, filtered_students[subjects].to_numpy().tolist())),
+                                        tuple(filtered_students['Total'].tolist()),
+                                        comparison_type)
+        st.plotly_chart(fig_compare, use_container_width=True)
+
+        # Show detailed table
+        st.dataframe(blues_gradient(filtered_students[[*INPUT_COLS, 'Total', 'Average']], subjects),
+                     use_container_width=True)
+
+@st.fragment
+def spotlight_section(latest_data, student_names):
+    """Student card (random, chosen, top or bottom) with a subject breakdown."""
+    spotlight_col1, spotlight_col2 = st.columns([1, 3])
+
+    with spotlight_col1:
+        spotlight_option = st.radio("Show:", 
+                                   ["Random Student", "Select Student", "Top Performer", "Needs Improvement"])
+
+    with spotlight_col2:
+        if spotlight_option == "Random Student":
+            spotlight_student = latest_data.sample(1).iloc[0]
+        elif spotlight_option == "Select Student":
+            selected_name = st.selectbox("Choose student:", student_names)
+            spotlight_student = latest_data.loc[[selected_name]].iloc[0]
+        elif spotlight_option == "Top Performer":
+            spotlight_student = latest_data.iloc[latest_data['Total'].to_numpy().argmax()]
+        else:  # Needs Improvement
+            spotlight_student = latest_data.iloc[latest_data['Total'].to_numpy().argmin()]
+
+        # Display student card
+        st.markdown(f"### 👤 {spotlight_student['Name']}")
+        metric_cols = st.columns(3)
+        metric_cols[0].metric("Total Marks", int(spotlight_student['Total']))
+        metric_cols[1].metric("Average", f"{spotlight_student['Average']:.1f}")
+        metric_cols[2].metric("Rank", f"#{int(spotlight_student['Rank'])}")
+
+        # Subject breakdown
+        student_subjects = spotlight_student[subjects]
+        fig_student = build_student_fig(spotlight_student['Name'], tuple(student_subjects.tolist()))
+        st.plotly_chart(fig_student, use_container_width=True)
+
+# ------------------------------
+# Progress sections
+# ------------------------------
+@st.fragment
+def student_progress_section(history_df):
+    """One student's Total over time; as a fragment, switching students skips the class aggregates."""
+    student_choice = st.selectbox("Select Student", history_df["Name"].unique())
+    student_hist = history_df[history_df["Name"] == student_choice]
+    if not student_hist.empty:
+        fig_student = px.line(student_hist, x="Date", y="Total", markers=True, render_mode="webgl", title=f"{student_choice}'s Total Marks Over Time", template=PLOTLY_THEME)
+        st.plotly_chart(fig_student, use_container_width=True)
+    else:
+        st.info("No data for this student yet.")
+
+# Connect (cached across reruns)
 sheet = connect_sheets()
 
 # ------------------------------
 # Sidebar navigation + state
 # ------------------------------
-if "page" not in st.session_state:
-    st.session_state.page = "Home"
-page = st.sidebar.radio("📍 Navigate", ["Home", "Visualizer", "Progress", "About"],
-                        index=["Home", "Visualizer", "Progress", "About"].index(st.session_state.page))
-st.session_state.page = page
+def go_to_page(name):
+    """Button callback: switch the navigation radio before it is redrawn."""
+    st.session_state.page = name
+
+page = st.sidebar.radio("📍 Navigate", PAGES, key="page")  # widget key owns session_state.page
 
 # ------------------------------
 # Home page - ENHANCED INTERACTIVE VERSION
@@ -94,24 +374,21 @@ if page == "Home":
     if sheet:
         history_df = read_history_from_sheet(sheet)
     else:
-        history_df = pd.DataFrame(columns=["Date", "Name"] + subjects)
+        history_df = pd.DataFrame(columns=HISTORY_COLS)
 
     if not history_df.empty:
-        # Ensure numeric subject columns exist and compute Total/Average safely
-        for sub in subjects:
-            if sub not in history_df.columns:
-                history_df[sub] = 0
-        history_df[subjects] = history_df[subjects].apply(pd.to_numeric, errors="coerce").fillna(0)
-        history_df["Total"] = history_df[subjects].sum(axis=1)
-        history_df["Average"] = history_df[subjects].mean(axis=1)
-
+        # read_history_from_sheet already returns every column, numeric and zero-filled
         # --- INTERACTIVE FEATURE 1: Date Selector ---
         st.markdown("---")
         st.subheader("📅 Select Date to View")
-        available_dates = sorted(history_df['Date'].unique(), reverse=True)
+        available_dates = history_df['Date'].cat.categories[::-1].tolist()  # categories are already sorted
         selected_date = st.selectbox("Choose a date:", available_dates, index=0)
         
-        latest_data = history_df[history_df['Date'] == selected_date]
+        # Index the day's rows by name so compare/spotlight lookups are label lookups, not scans
+        # Total/Average/Rank for the chosen day are computed once and reused by every section below
+        latest_data = add_totals(history_df[history_df['Date'] == selected_date]
+                                 .set_index('Name', drop=False).rename_axis(None))
+        student_names = latest_data['Name'].unique().tolist()
 
         if not latest_data.empty:
             # --- INTERACTIVE FEATURE 2: Top 3 Leaderboard ---
@@ -120,12 +397,13 @@ if page == "Home":
             
             with col1:
                 st.subheader("🏆 Top 3 Leaderboard")
-                top3 = latest_data.nlargest(3, 'Total')[['Name', 'Total', 'Average']].reset_index(drop=True)
+                top_idx = top_k_positions(latest_data['Total'].to_numpy(), 3)
+                top3 = latest_data.iloc[top_idx][['Name', 'Total', 'Average']].reset_index(drop=True)
                 top3.index = ['🥇 1st', '🥈 2nd', '🥉 3rd'][:len(top3)]
                 st.dataframe(top3, use_container_width=True)
             
             with col2:
-                topper = latest_data.loc[latest_data['Total'].idxmax()]
+                topper = latest_data.iloc[latest_data['Total'].to_numpy().argmax()]
                 st.metric(label="🏆 Top Scorer", value=topper['Name'], delta=f"{int(topper['Total'])} marks")
                 st.metric(label="📊 Average", value=f"{topper['Average']:.1f}", delta="Best performer")
 
@@ -144,81 +422,12 @@ if page == "Home":
             # --- INTERACTIVE FEATURE 3: Subject Performance Chart ---
             st.markdown("---")
             st.subheader("📊 Subject-wise Performance")
-            
-            chart_col1, chart_col2 = st.columns([3, 1])
-            
-            with chart_col2:
-                st.write("**Options:**")
-                show_class_avg = st.checkbox("Show Class Average", value=True)
-                chart_style = st.radio("Chart Style:", ["Bar", "Line"], index=0)
-            
-            with chart_col1:
-                subject_means = latest_data[subjects].mean()
-                
-                if chart_style == "Bar":
-                    fig = px.bar(subject_means, x=subject_means.index, y=subject_means.values,
-                                labels={'y': 'Average Marks', 'x': 'Subject'}, 
-                                template=PLOTLY_THEME, 
-                                title=f"Subject Averages - {selected_date}")
-                    fig.update_traces(marker_color='#1f77b4')
-                else:
-                    fig = px.line(subject_means, x=subject_means.index, y=subject_means.values,
-                                 labels={'y': 'Average Marks', 'x': 'Subject'}, 
-                                 template=PLOTLY_THEME,
-                                 title=f"Subject Averages - {selected_date}",
-                                 markers=True)
-                
-                if show_class_avg:
-                    fig.add_hline(y=avg_today, line_dash="dash", 
-                                 annotation_text=f"Class Avg: {avg_today:.1f}",
-                                 line_color="red")
-                
-                st.plotly_chart(fig, use_container_width=True)
+            subject_chart_section(latest_data, selected_date, avg_today)
 
             # --- INTERACTIVE FEATURE 4: Student Search & Compare ---
             st.markdown("---")
             st.subheader("🔍 Search & Compare Students")
-            
-            search_col1, search_col2 = st.columns([2, 1])
-            
-            with search_col1:
-                student_names = latest_data['Name'].unique().tolist()
-                selected_students = st.multiselect(
-                    "Select students to compare (max 5):",
-                    student_names,
-                    default=student_names[:2] if len(student_names) >= 2 else student_names,
-                    max_selections=5
-                )
-            
-            with search_col2:
-                comparison_type = st.radio("Compare by:", ["Total Marks", "Subject-wise"])
-            
-            if selected_students:
-                filtered_students = latest_data[latest_data['Name'].isin(selected_students)]
-                
-                if comparison_type == "Total Marks":
-                    fig_compare = px.bar(filtered_students, x='Name', y='Total',
-                                        title="Total Marks Comparison",
-                                        template=PLOTLY_THEME,
-                                        color='Total',
-                                        color_continuous_scale='Blues')
-                    st.plotly_chart(fig_compare, use_container_width=True)
-                else:
-                    # Subject-wise comparison
-                    melted = filtered_students.melt(id_vars=['Name'], 
-                                                   value_vars=subjects,
-                                                   var_name='Subject', 
-                                                   value_name='Marks')
-                    fig_compare = px.bar(melted, x='Subject', y='Marks', color='Name',
-                                        barmode='group',
-                                        title="Subject-wise Comparison",
-                                        template=PLOTLY_THEME)
-                    st.plotly_chart(fig_compare, use_container_width=True)
-                
-                # Show detailed table
-                st.dataframe(filtered_students[['Name'] + subjects + ['Total', 'Average']]
-                           .style.background_gradient(cmap="Blues", subset=subjects),
-                           use_container_width=True)
+            compare_section(latest_data, student_names)
 
             # --- INTERACTIVE FEATURE 5: Performance Distribution ---
             st.markdown("---")
@@ -228,60 +437,20 @@ if page == "Home":
             
             with dist_col1:
                 # Total marks distribution
-                fig_hist = px.histogram(latest_data, x='Total', nbins=10,
-                                       title="Total Marks Distribution",
-                                       template=PLOTLY_THEME,
-                                       labels={'Total': 'Total Marks', 'count': 'Number of Students'})
-                fig_hist.update_traces(marker_color='lightblue')
+                fig_hist = build_histogram_fig(tuple(latest_data['Total'].tolist()), 'Total Marks',
+                                               "Total Marks Distribution", 'lightblue')
                 st.plotly_chart(fig_hist, use_container_width=True)
             
             with dist_col2:
                 # Average marks distribution
-                fig_avg_hist = px.histogram(latest_data, x='Average', nbins=10,
-                                           title="Average Marks Distribution",
-                                           template=PLOTLY_THEME,
-                                           labels={'Average': 'Average Marks', 'count': 'Number of Students'})
-                fig_avg_hist.update_traces(marker_color='lightgreen')
+                fig_avg_hist = build_histogram_fig(tuple(latest_data['Average'].tolist()), 'Average Marks',
+                                                   "Average Marks Distribution", 'lightgreen')
                 st.plotly_chart(fig_avg_hist, use_container_width=True)
 
             # --- INTERACTIVE FEATURE 6: Student Spotlight with Filter ---
             st.markdown("---")
             st.subheader("✨ Student Spotlight")
-            
-            spotlight_col1, spotlight_col2 = st.columns([1, 3])
-            
-            with spotlight_col1:
-                spotlight_option = st.radio("Show:", 
-                                           ["Random Student", "Select Student", "Top Performer", "Needs Improvement"])
-            
-            with spotlight_col2:
-                if spotlight_option == "Random Student":
-                    spotlight_student = latest_data.sample(1).iloc[0]
-                elif spotlight_option == "Select Student":
-                    selected_name = st.selectbox("Choose student:", latest_data['Name'].unique())
-                    spotlight_student = latest_data[latest_data['Name'] == selected_name].iloc[0]
-                elif spotlight_option == "Top Performer":
-                    spotlight_student = latest_data.loc[latest_data['Total'].idxmax()]
-                else:  # Needs Improvement
-                    spotlight_student = latest_data.loc[latest_data['Total'].idxmin()]
-                
-                # Display student card
-                st.markdown(f"### 👤 {spotlight_student['Name']}")
-                metric_cols = st.columns(3)
-                metric_cols[0].metric("Total Marks", int(spotlight_student['Total']))
-                metric_cols[1].metric("Average", f"{spotlight_student['Average']:.1f}")
-                
-                # Calculate rank
-                rank = (latest_data['Total'] > spotlight_student['Total']).sum() + 1
-                metric_cols[2].metric("Rank", f"#{rank}")
-                
-                # Subject breakdown
-                student_subjects = spotlight_student[subjects]
-                fig_student = px.bar(x=subjects, y=student_subjects.values,
-                                    title=f"{spotlight_student['Name']}'s Subject Performance",
-                                    template=PLOTLY_THEME,
-                                    labels={'x': 'Subject', 'y': 'Marks'})
-                st.plotly_chart(fig_student, use_container_width=True)
+            spotlight_section(latest_data, student_names)
 
         else:
             st.warning("No entries for selected date.")
@@ -290,9 +459,8 @@ if page == "Home":
 
     # --- Quick Action Button ---
     st.markdown("---")
-    if st.button("🚀 Go to Visualizer", type="primary", use_container_width=True):
-        st.session_state.page = "Visualizer"
-        st.rerun()
+    st.button("🚀 Go to Visualizer", type="primary", use_container_width=True,
+              on_click=go_to_page, args=("Visualizer",))
 
 # ------------------------------
 # Visualizer page
@@ -321,61 +489,45 @@ elif page == "Visualizer":
 
     # Clear inputs
     if st.button("🧹 Clear All Inputs"):
-        for i in range(st.session_state.num_students):
-            st.session_state.pop(f"name_{i}", None)
-            for sub in subjects:
-                st.session_state.pop(f"{sub}_{i}", None)
-        st.session_state.student_data = [{} for _ in range(st.session_state.num_students)]
+        clear_student_inputs()
+        st.session_state.student_table = fit_students(pd.DataFrame(columns=INPUT_COLS), n, max_marks)
         st.success("All student inputs cleared.")
 
-    # Ensure student_data matches number of students
-    if "student_data" not in st.session_state:
-        st.session_state.student_data = [{} for _ in range(n)]
-    else:
-        if len(st.session_state.student_data) < n:
-            st.session_state.student_data += [{} for _ in range(n - len(st.session_state.student_data))]
-        elif len(st.session_state.student_data) > n:
-            st.session_state.student_data = st.session_state.student_data[:n]
+    # Ensure student_table matches number of students
+    if "student_table" not in st.session_state:
+        st.session_state.student_table = fit_students(pd.DataFrame(columns=INPUT_COLS), n, max_marks)
+    elif len(st.session_state.student_table) != n:
+        clear_student_inputs()  # pending edits are keyed by row position
+        st.session_state.student_table = fit_students(st.session_state.student_table, n, max_marks)
 
     # ✅ Load Last Saved Data button (fixed placement)
     st.header("Step 1: Load Last Saved Data (Optional)")
-    if st.button("🕒 Load Last Saved Data"):
+    load_col, refresh_col = st.columns([1, 1])
+    load_clicked = load_col.button("🕒 Load Last Saved Data")
+    # history is cached; this forces the next read to hit Google Sheets again
+    if refresh_col.button("🔄 Refresh from Sheet"):
+        _load_history.clear()
+        st.rerun()
+    if load_clicked:
         if sheet:
             history_df = read_history_from_sheet(sheet)
         else:
-            history_df = pd.DataFrame(columns=["Date", "Name"] + subjects + ["Total", "Average", "Rank"])
+            history_df = pd.DataFrame(columns=HISTORY_COLS)
             
         if not history_df.empty:
-            for sub in subjects:
-                if sub not in history_df.columns:
-                    history_df[sub] = 0
-            history_df[subjects] = history_df[subjects].apply(pd.to_numeric, errors="coerce").fillna(0)
-
-            # Compute Total/Average/Rank if not present
-            if "Total" not in history_df.columns:
-                history_df["Total"] = history_df[subjects].sum(axis=1)
-            if "Average" not in history_df.columns:
-                history_df["Average"] = history_df[subjects].mean(axis=1)
-            if "Rank" not in history_df.columns:
-                history_df["Rank"] = history_df["Total"].rank(ascending=False, method="min").astype(int)
+            history_df[subjects] = history_df[subjects].astype(np.int64)  # integer mark columns in the editor
 
             # Get latest date's data
             latest_date = history_df["Date"].max()
             latest_data = history_df[history_df["Date"] == latest_date]
 
             if not latest_data.empty:
-                st.session_state.student_data = latest_data[["Name"] + subjects].to_dict("records")
-
-                # Clear any old keys
-                for key in list(st.session_state.keys()):
-                    if key.startswith("name_") or any(key.startswith(f"{sub}_") for sub in subjects):
-                        st.session_state.pop(key, None)
+                # plain-text names: a categorical column would render as a dropdown
+                loaded = latest_data[INPUT_COLS].astype({"Name": object})
+                st.session_state.student_table = fit_students(loaded, n, max_marks)
 
-                # Refill session state
-                for i, student in enumerate(st.session_state.student_data):
-                    st.session_state[f"name_{i}"] = student["Name"]
-                    for sub in subjects:
-                        st.session_state[f"{sub}_{i}"] = student[sub]
+                # Drop edits made against the old table
+                clear_student_inputs()
 
                 st.success(f"✅ Loaded last saved data from {latest_date}")
             else:
@@ -383,54 +535,44 @@ elif page == "Visualizer":
         else:
             st.warning("No saved data available.")
 
-    # Manual inputs (persistent)
-    student_data = []
-    for i in range(n):
-        with st.expander(f"Student {i+1}"):
-            name_key = f"name_{i}"
-            if name_key not in st.session_state:
-                st.session_state[name_key] = st.session_state.student_data[i].get("Name", "") if i < len(st.session_state.student_data) else ""
-            name = st.text_input("Name", value=st.session_state[name_key], key=f"name_input_{i}")
-            st.session_state[name_key] = name
-
-            marks = {}
-            for sub in subjects:
-                mark_key = f"{sub}_{i}"
-                if mark_key not in st.session_state:
-                    default_val = st.session_state.student_data[i].get(sub, int(max_marks/2)) if i < len(st.session_state.student_data) else int(max_marks/2)
-                    st.session_state[mark_key] = default_val
-                marks[sub] = st.number_input(f"{sub} marks", 0, max_marks, value=st.session_state[mark_key], key=f"{sub}_input_{i}")
-                st.session_state[mark_key] = marks[sub]
-
-            student_data.append({"Name": name if name else f"Student {i+1}", **marks})
-
-    # compute results table
-    df = pd.DataFrame(student_data)
-    if not df.empty:
-        df[subjects] = df[subjects].apply(pd.to_numeric, errors="coerce").fillna(0)
-    df["Total"] = df[subjects].sum(axis=1)
-    df["Average"] = df[subjects].mean(axis=1)
-    df["Rank"] = df["Total"].rank(ascending=False, method="min").astype(int)
+    # Manual inputs (persistent); the form batches edits into a single rerun on submit
+    mark_column = dict(min_value=0, max_value=max_marks, step=1, required=True)
+    editor_key = f"student_editor_{st.session_state.get('editor_rev', 0)}"  # a new key drops browser-side edits
+    with st.form("student_inputs"):
+        edited = st.data_editor(
+            st.session_state.student_table, key=editor_key, num_rows="fixed",
+            hide_index=True, use_container_width=True,
+            column_config={"Name": st.column_config.TextColumn("Name"),
+                           **{sub: st.column_config.NumberColumn(label, **mark_column) for sub, label in MARK_LABELS.items()}},
+        )
+        # Save submits too, so it always writes exactly what the editor shows
+        update_col, save_col = st.columns([1, 1])
+        update_col.form_submit_button("✅ Update Table")
+        save_clicked = save_col.form_submit_button("💾 Save Today's Results")
+    st.session_state.student_table = edited
+    names = [name or f"Student {i+1}" for i, name in enumerate(edited["Name"].fillna(""))]
+    marks_arr = numeric_block(edited, subjects, np.int64)  # a cleared cell counts as 0
+
+    # compute results table, reusing the last one while the inputs are unchanged
+    df_sig = (tuple(names), marks_arr.tobytes())
+    if st.session_state.get("results_sig") != df_sig or "results_df" not in st.session_state:
+        st.session_state.results_df = add_totals(pd.DataFrame({"Name": names, **dict(zip(subjects, marks_arr.T))}))
+        st.session_state.results_sig = df_sig
+    df = st.session_state.results_df
 
     st.header("Step 2: Results Table")
-    st.dataframe(df.style.background_gradient(cmap="Blues"))
+    st.dataframe(blues_gradient(df, NUMERIC_COLS))
 
     # topper
     if not df.empty:
-        topper = df.loc[df["Total"].idxmax()]
+        topper = df.iloc[df["Total"].to_numpy().argmax()]
         st.subheader("🏆 Topper")
         st.success(f"{topper['Name']} with {int(topper['Total'])} marks (Avg: {topper['Average']:.1f})")
 
     # charts
     st.header("Step 3: Visualize Data")
     chart_type = st.radio("Select chart type", ["Bar", "Line", "Radar"])
-    if chart_type == "Bar":
-        fig = px.bar(df, x="Name", y=subjects, barmode="group", template=PLOTLY_THEME, title="Marks Comparison")
-    elif chart_type == "Line":
-        fig = px.line(df, x="Name", y=subjects, markers=True, template=PLOTLY_THEME, title="Trend Across Subjects")
-    else:
-        melted = df.melt(id_vars=["Name"], value_vars=subjects, var_name="Subject", value_name="Marks")
-        fig = px.line_polar(melted, r="Marks", theta="Subject", color="Name", line_close=True, template=PLOTLY_THEME, title="Radar Chart")
+    fig = build_marks_fig(chart_type, df["Name"].tolist(), df[subjects].to_numpy())
     st.plotly_chart(fig, use_container_width=True)
 
     # weak subjects
@@ -442,28 +584,24 @@ elif page == "Visualizer":
     else:
         st.success("No weak subjects detected (averages >= 50%)" if not df.empty else "Enter data to see insights.")
 
-    # Save to Google Sheets
-    if st.button("💾 Save Today's Results"):
+    # Save to Google Sheets (the button lives in the input form above)
+    if save_clicked:
         today = datetime.date.today().isoformat()
-        df_copy = df.copy()
-        df_copy.insert(0, "Date", today)
-        # ✅ Include Total, Average, and Rank
-        rows_to_append = df_copy[["Date", "Name"] + subjects + ["Total", "Average", "Rank"]].values.tolist()
+        # ✅ Include Total, Average, and Rank (rows follow HISTORY_COLS; integer marks keep the payload small)
+        marks_and_total = df[[*subjects, "Total"]].to_numpy(dtype=np.int64).tolist()
+        rows_to_append = [[today, name, *ints, avg, rank] for name, ints, avg, rank
+                          in zip(df["Name"].tolist(), marks_and_total, df["Average"].tolist(), df["Rank"].tolist())]
     
         if sheet:
             wrote = append_rows_to_sheet(sheet, rows_to_append)
             if wrote:
+                _load_history.clear()  # next rerun must see the new rows
+                clear_student_inputs()  # the saved table becomes the editor's new starting point
                 st.success("✅ Saved to Google Sheet (with Total, Average, Rank)")
             else:
                 st.error("Failed to save to Google Sheets")
         else:
             st.error("Google Sheets not connected. Cannot save data.")
-    
-        # Clear session_state after saving
-        for i in range(n):
-            st.session_state.pop(f"name_{i}", None)
-            for sub in subjects:
-                st.session_state.pop(f"{sub}_{i}", None)
         
         st.rerun()  # ✅ Refresh the page after saving
 
@@ -479,46 +617,24 @@ elif page == "Progress":
     if sheet:
         history_df = read_history_from_sheet(sheet)
     else:
-        history_df = pd.DataFrame(columns=["Date", "Name"] + subjects)
+        history_df = pd.DataFrame(columns=HISTORY_COLS)
 
     if history_df.empty:
         st.warning("No progress saved yet. Go to Visualizer and save today's results.")
     else:
-        # ensure presence of subject columns and numeric
-        for sub in subjects:
-            if sub not in history_df.columns:
-                history_df[sub] = 0
-        history_df[subjects] = history_df[subjects].apply(pd.to_numeric, errors="coerce").fillna(0)
-
-        # compute totals/averages if missing
-        if "Total" not in history_df.columns:
-            history_df["Total"] = history_df[subjects].sum(axis=1)
-        if "Average" not in history_df.columns:
-            history_df["Average"] = history_df[subjects].mean(axis=1)
-
         st.write("### Saved Progress History")
-        st.dataframe(history_df)
+        st.dataframe(history_df, use_container_width=True, hide_index=True)
 
-        history_df["Average"] = pd.to_numeric(history_df["Average"], errors="coerce")
-        avg_progress = history_df.groupby("Date", as_index=False)["Average"].mean()
+        avg_progress, topper_progress = daily_progress(history_df)
 
-        fig_avg = px.line(avg_progress, x="Date", y="Average", markers=True, title="Average Performance Over Time", template=PLOTLY_THEME)
+        fig_avg = px.line(avg_progress, x="Date", y="Average", markers=True, render_mode="webgl", title="Average Performance Over Time", template=PLOTLY_THEME)
         st.plotly_chart(fig_avg, use_container_width=True)
 
-        history_df["Total"] = pd.to_numeric(history_df["Total"], errors="coerce")
-        topper_progress = history_df.groupby("Date", as_index=False)["Total"].max()
-
-        fig_topper = px.line(topper_progress, x="Date", y="Total", markers=True, title="Topper's Total Over Time", template=PLOTLY_THEME)
+        fig_topper = px.line(topper_progress, x="Date", y="Total", markers=True, render_mode="webgl", title="Topper's Total Over Time", template=PLOTLY_THEME)
         st.plotly_chart(fig_topper, use_container_width=True)
 
         st.subheader("📌 Track Individual Student")
-        student_choice = st.selectbox("Select Student", history_df["Name"].unique())
-        student_hist = history_df[history_df["Name"] == student_choice]
-        if not student_hist.empty:
-            fig_student = px.line(student_hist, x="Date", y="Total", markers=True, title=f"{student_choice}'s Total Marks Over Time", template=PLOTLY_THEME)
-            st.plotly_chart(fig_student, use_container_width=True)
-        else:
-            st.info("No data for this student yet.")
+        student_progress_section(history_df)
 
 # ------------------------------
 # About page